@@ -0,0 +1,17 @@
+# Picked up by gunicorn from the working directory (/app) of Superset's run-server.sh,
+# which passes the worker settings on the command line.
+
+# Build the Superset app once in the master so workers share its memory copy-on-write
+# instead of each importing and initializing it.
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Give each worker its own metadata DB connections instead of the master's sockets."""
+    if not server.cfg.preload_app:
+        return
+    from superset.extensions import db
+
+    with server.app.wsgi().app_context():
+        # Drop the pooled connections without closing the sockets the master still shares.
+        db.engine.dispose(close=False)
@@ -1,40 +1,205 @@
+import functools
+import json
 import logging
 import os
+import traceback
+import weakref
+from types import MappingProxyType
 
-logger = logging.getLogger()
+import yaml
+from sqlalchemy.engine import URL
 
-database_password = os.environ.get("DATABASE_PASSWORD")
-database_host = os.environ.get("DATABASE_HOST")
-database_name = os.environ.get("DATABASE_NAME")
-database_user = os.environ.get("DATABASE_USER")
-admin_password = os.environ.get("ADMIN_PASSWORD")
+logger = logging.getLogger("superset_config")
 
-FEATURE_FLAGS = {
+# One copy of the environment, read once at import; with a preloaded app,
+# workers share it instead of each decoding os.environ.
+_E = dict(os.environ)
+
+
+def _env_flag(name, default):
+    """Read a true/false setting from the environment."""
+    return _E.get(name, str(default)).lower() == "true"
+
+
+try:
+    import orjson
+
+    def _json_dumps(obj):
+        return orjson.dumps(obj, default=str).decode()
+
+except ImportError:
+
+    def _json_dumps(obj):
+        return json.dumps(obj, default=str)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single JSON line, for log shippers."""
+
+    def format(self, record):
+        entry = {"lvl": record.levelname, "msg": record.getMessage(), "name": record.name}
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return _json_dumps(entry)
+
+
+# Opt in with LOG_JSON=true; configured before Superset's own logging setup,
+# which then leaves the root handler in place.
+if _env_flag("LOG_JSON", False):
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(JsonFormatter())
+    logging.basicConfig(handlers=[_handler], level=logging.INFO, force=True)
+
+
+(
+    database_password,
+    database_host,
+    database_name,
+    database_user,
+    admin_password,
+    secret_key,
+) = (
+    _E.get("DATABASE_PASSWORD"),
+    _E.get("DATABASE_HOST"),
+    _E.get("DATABASE_NAME"),
+    _E.get("DATABASE_USER"),
+    _E.get("ADMIN_PASSWORD"),
+    _E.get("SUPERSET_SECRET_KEY"),
+)
+
+
+def _load_overrides(path):
+    """Read the settings to override from a YAML mapping of setting names to values."""
+    with open(path) as f:
+        overrides = yaml.safe_load(f) or {}
+    if not isinstance(overrides, dict) or not all(isinstance(k, str) for k in overrides):
+        raise RuntimeError(f"{path} must contain a mapping of setting names to values")
+    return {k: v for k, v in overrides.items() if k.isupper()}
+
+
+# Environment-specific overrides, applied at the end so they win over everything here.
+_overrides_path = _E.get("SUPERSET_CONFIG_YAML")
+_overrides = _load_overrides(_overrides_path) if _overrides_path else {}
+
+# Each variable is only required if the override file does not set what it builds.
+_required = {
+    "DATABASE_PASSWORD": (database_password, "SQLALCHEMY_DATABASE_URI"),
+    "DATABASE_HOST": (database_host, "SQLALCHEMY_DATABASE_URI"),
+    "DATABASE_NAME": (database_name, "SQLALCHEMY_DATABASE_URI"),
+    "DATABASE_USER": (database_user, "SQLALCHEMY_DATABASE_URI"),
+    "SUPERSET_SECRET_KEY": (secret_key, "SECRET_KEY"),
+}
+_missing = [
+    name for name, (value, setting) in _required.items() if not value and setting not in _overrides
+]
+if _missing:
+    raise RuntimeError(f"Missing required environment variables: {', '.join(_missing)}")
+
+# Read-only: Superset merges these into its own flags and never mutates them.
+FEATURE_FLAGS = MappingProxyType({
     "ENABLE_TEMPLATE_PROCESSING": True,
     "DASHBOARD_CROSS_FILTERS": True,
-    "DRILL_TO_DETAIL": True
-}
+    "DRILL_TO_DETAIL": True,
+})
 
-ENABLE_PROXY_FIX = True
-SECRET_KEY = "YOUR_OWN_RANDOM_GENERATED_STRING"
+ENABLE_PROXY_FIX = _env_flag("ENABLE_PROXY_FIX", True)
+SECRET_KEY = secret_key
+# The key stored secrets are still encrypted with, while rotating to a new SECRET_KEY
+# with `superset re-encrypt-secrets`.
+if _E.get("PREVIOUS_SECRET_KEY"):
+    PREVIOUS_SECRET_KEY = _E["PREVIOUS_SECRET_KEY"]
 
 # WTF_CSRF_ENABLED = False
-TALISMAN_ENABLED = True
+TALISMAN_ENABLED = _env_flag("TALISMAN_ENABLED", True)
 
-SQLALCHEMY_DATABASE_URI = f"postgresql+psycopg2://{database_user}:{database_password}@{database_host}:5432/{database_name}"
-SQLALCHEMY_ECHO = True
+@functools.lru_cache(maxsize=1)
+def _build_uri():
+    """Metadata DB URI; URL.create escapes credentials containing "@", ":", "/" or "%"."""
+    return URL.create(
+        # psycopg (v3) needs SQLAlchemy 2, which Superset 4.1 does not support yet.
+        f"postgresql+{_E.get('DATABASE_DRIVER', 'psycopg2')}",
+        username=database_user,
+        password=database_password,
+        host=database_host,
+        port=5432,
+        database=database_name,
+    ).render_as_string(hide_password=False)
 
 
-# Flask-AppBuilder Init Hook for custom views
-FLASK_APP_MUTATOR = lambda app: init_custom_views(app)
+SQLALCHEMY_DATABASE_URI = _build_uri()
+SQLALCHEMY_ENGINE_OPTIONS = {
+    "pool_size": int(_E.get("DB_POOL_SIZE", 10)),
+    "max_overflow": int(_E.get("DB_MAX_OVERFLOW", 20)),
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+    # Reuse the most recently returned connection so a small warm set serves most requests.
+    "pool_use_lifo": True,
+}
+# Logging every statement is costly; opt in with SQLALCHEMY_ECHO=true when debugging.
+SQLALCHEMY_ECHO = _env_flag("SQLALCHEMY_ECHO", False)
+
+# Compress responses with Flask-Compress. text/event-stream is left out so the
+# assistant's streamed replies are not buffered by the compressor.
+COMPRESS_REGISTER = True
+COMPRESS_MIMETYPES = [
+    "application/json",
+    "text/html",
+    "text/css",
+    "application/javascript",
+    "image/svg+xml",
+]
+COMPRESS_LEVEL = 6
+COMPRESS_MIN_SIZE = 500
+try:
+    import brotli  # noqa: F401
+
+    COMPRESS_ALGORITHM = ["br", "gzip"]
+except ImportError:
+    COMPRESS_ALGORITHM = "gzip"
+
+# Back Superset's caches with Redis when one is available (set REDIS_HOST);
+# otherwise Superset falls back to its defaults.
+redis_host = _E.get("REDIS_HOST")
+if redis_host:
+    _redis_url = f"redis://{redis_host}:{_E.get('REDIS_PORT', 6379)}/"
+    CACHE_CONFIG = {
+        "CACHE_TYPE": "RedisCache",
+        "CACHE_DEFAULT_TIMEOUT": 300,
+        "CACHE_KEY_PREFIX": "superset_",
+        "CACHE_REDIS_URL": _redis_url + "1",
+    }
+    DATA_CACHE_CONFIG = {
+        **CACHE_CONFIG,
+        "CACHE_DEFAULT_TIMEOUT": 86400,
+        "CACHE_KEY_PREFIX": "superset_data_",
+        "CACHE_REDIS_URL": _redis_url + "2",
+    }
+    FILTER_STATE_CACHE_CONFIG = {
+        **CACHE_CONFIG,
+        "CACHE_KEY_PREFIX": "superset_filter_",
+        "CACHE_REDIS_URL": _redis_url + "3",
+    }
+    EXPLORE_FORM_DATA_CACHE_CONFIG = {
+        **CACHE_CONFIG,
+        "CACHE_KEY_PREFIX": "superset_explore_",
+        "CACHE_REDIS_URL": _redis_url + "4",
+    }
+
+
+# Apps the custom views were registered on. The mutator may run again for the
+# same app (e.g. after a fork or in tests), and each add_view rescans the menu;
+# weak references let discarded apps be collected.
+_initialized_apps = weakref.WeakSet()
+
 
 def init_custom_views(app):
     """Initialize custom views after Flask app is created"""
+    if app in _initialized_apps:
+        return
     try:
         from superset_chat.ai_superset_assistant import AISupersetAssistantView
         
         # Get the appbuilder instance
-        from flask_appbuilder import AppBuilder
         appbuilder = app.appbuilder
         
         # Register the view
@@ -45,9 +210,17 @@ def init_custom_views(app):
             category="Custom Tools"
         )
         
+        _initialized_apps.add(app)
         logger.info("✅ Functional AI Superset Assistant plugin registered successfully!")
         
     except Exception as e:
         logger.error(f"❌ Failed to register functional AI Superset Assistant plugin: {e}")
-        import traceback
         logger.error(traceback.format_exc())
+
+
+# Flask-AppBuilder Init Hook for custom views
+FLASK_APP_MUTATOR = init_custom_views
+
+
+# Applied last so the override file wins over everything above.
+globals().update(_overrides)
@@ -1,28 +1,80 @@
-from flask import render_template_string, request, jsonify, Response, g
+from flask import render_template_string, request, jsonify, Response, g, send_from_directory
 from functools import wraps
+from json.encoder import encode_basestring_ascii
 from flask_appbuilder import BaseView, expose
 from flask_login import current_user
 import logging
 import json
-import uuid
+import re
+import html
+import hashlib
+import secrets
+import queue
 import asyncio
 import threading
-from datetime import datetime
+import time
 from functools import wraps
 import os
 from pathlib import Path
 
-from superset_chat.app.server.llm import get_stream_agent_responce
-from superset_chat.app.databases.postgres import Database
+from superset_chat.app.utils.ttl_cache import TTLCache
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+STATIC_FOLDER = Path(__file__).parent / 'static'
+
+def _asset_version(filename):
+    """Short content hash of a static asset, used to bust browser caches when it changes"""
+    return hashlib.md5((STATIC_FOLDER / filename).read_bytes()).hexdigest()[:8]
+
+ASSET_VERSIONS = {name: _asset_version(name) for name in ('ai_assistant.css', 'ai_assistant.js')}
+
+# SSE framing for streamed text; the chunk is spliced in as an escaped JSON string.
+_CHUNK_PREFIX = b'data: {"type": "chunk", "content": '
+_CHUNK_SUFFIX = b'}\n\n'
+
+# Fixed SSE frames; only the session frame varies, by its (JSON-safe) session ID.
+_SESSION_PREFIX = b'data: {"type": "session", "session_id": "'
+_SESSION_SUFFIX = b'"}\n\n'
+_DONE_FRAME = b'data: {"type": "done"}\n\n'
+_ERROR_FRAME = b'data: {"type": "error", "content": "I encountered an error. Please try again."}\n\n'
+
+# Streamed chunks are coalesced into one frame until this many characters are
+# buffered, or this many seconds have passed since the previous frame.
+STREAM_FLUSH_CHARS = int(os.environ.get('AI_STREAM_FLUSH_CHARS', 64))
+STREAM_FLUSH_INTERVAL = float(os.environ.get('AI_STREAM_FLUSH_INTERVAL', 0.016))
+
+# How many frames may wait for a slow client, and for how long (in seconds)
+# the producer waits for room before the response is abandoned.
+STREAM_QUEUE_SIZE = 32
+STREAM_PUT_TIMEOUT = 30
+STREAM_PUT_POLL = 0.02
+
+# Lightweight markdown applied to a finished response, in this order.
+_MD_BOLD = re.compile(r'\*\*(.*?)\*\*')
+_MD_FENCE = re.compile(r'```([\s\S]*?)```')
+_MD_CODE = re.compile(r'`([^`]+)`')
+
+# Marks the end of a stream pumped from the event loop into a `queue.Queue`.
+_STREAM_END = object()
+
 def admin_only(f):
-    """Decorator to restrict access to authenticated users."""
+    """Decorator to restrict access to authenticated users.
+    
+    The authenticated user's name is stored as `g._username` for the view.
+    """
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not current_user or not current_user.is_authenticated:
             return jsonify({"error": "Authentication required"}), 401
+        g._username = current_user.username
         return f(*args, **kwargs)
     return decorated_function
 
@@ -37,35 +89,115 @@ def failure_tolerant(f):
             return jsonify({"error": "Something went wrong"}), 500
     return decorated_function
 
+def _dumps(obj):
+    """Serialize `obj` to JSON bytes, using orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+def _loads(data):
+    """Parse a JSON document from bytes, using orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _frame(event):
+    """Build an SSE frame carrying `event` as JSON."""
+    return b'data: ' + _dumps(event) + b'\n\n'
+
+def _chunk_frame(chunk):
+    """Build the SSE frame for one streamed text chunk."""
+    if ORJSON_AVAILABLE:
+        content = orjson.dumps(chunk)
+    else:
+        content = encode_basestring_ascii(chunk).encode()
+    return _CHUNK_PREFIX + content + _CHUNK_SUFFIX
+
+def _md_to_html(text):
+    """Render the lightweight markdown of an AI response as HTML"""
+    text = _MD_BOLD.sub(r'<strong>\1</strong>', html.escape(text, quote=False))
+    text = _MD_FENCE.sub(r'<pre><code>\1</code></pre>', text)
+    return _MD_CODE.sub(r'<code>\1</code>', text).replace('\n', '<br>')
+
+async def _enqueue(q, item):
+    """Put `item` on a thread queue without blocking the event loop.
+    
+    While the queue is full, waits on the loop itself, so a slow or departed
+    client holds no thread. Raises `queue.Full` if the consumer makes no room
+    within `STREAM_PUT_TIMEOUT`.
+    """
+    deadline = time.monotonic() + STREAM_PUT_TIMEOUT
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            if time.monotonic() >= deadline:
+                raise
+            await asyncio.sleep(STREAM_PUT_POLL)
+
+
+class _Session:
+    """Metadata tracked for a chat session"""
+    __slots__ = ('username',)
+    
+    def __init__(self, username):
+        self.username = username
+
 
 class AIAssistantAgent:
     """Real AI Assistant agent using LangGraph"""
     
-    def __init__(self):
-        self.sessions = {}  # Track session metadata
+    def __init__(self, md_uri=None):
+        self.md_uri = md_uri  # Checkpointer database URI
+        # Track session metadata; bounded, idle sessions expire after an hour
+        self.sessions = TTLCache(maxsize=10_000, ttl=3600)
+        self._lock = threading.Lock()
     
-    def create_session(self):
+    def create_session(self, username='anonymous'):
         """Create a new chat session"""
-        session_id = str(uuid.uuid4())
-        self.sessions[session_id] = {
-            'created_at': datetime.now(),
-            'username': getattr(current_user, 'username', 'anonymous') if current_user and current_user.is_authenticated else 'anonymous'
-        }
+        session_id = secrets.token_urlsafe(16)
+        with self._lock:
+            self.sessions[session_id] = _Session(username)
         return session_id
     
+    def ensure_session(self, session_id=None, username=None):
+        """Return `session_id` if it is a live session, otherwise create a new one"""
+        with self._lock:
+            session = self.sessions.get(session_id) if session_id else None
+            if session is not None:
+                # Store it again to restart the expiry timer, so only idle sessions expire.
+                self.sessions[session_id] = session
+                return session_id
+        return self.create_session(username or 'anonymous')
+    
+    def clear_session(self, session_id):
+        """Forget a chat session, returning whether it existed"""
+        with self._lock:
+            return self.sessions.pop(session_id) is not None
+    
     async def get_response_stream(self, message, session_id=None, username=None):
-        """Generate AI response using real LangGraph implementation"""
-        if not session_id or session_id not in self.sessions:
-            session_id = self.create_session()
+        """Generate AI response using real LangGraph implementation
+        
+        Yields the response as ordered text chunks. Callers that need the full
+        text should collect the chunks in a list and `''.join` them once, rather
+        than growing a string with `+=`.
+        """
+        session_id = self.ensure_session(session_id, username)
         
         if not username:
-            username = self.sessions[session_id].get('username', 'anonymous')
+            with self._lock:
+                session = self.sessions.get(session_id)
+            username = session.username if session else 'anonymous'
         
         try:
+            # Imported on first use, keeping the LLM stack out of Superset's startup.
+            from superset_chat.app.server.llm import get_stream_agent_responce
+            
             stream_generator = await get_stream_agent_responce(
                 session_id=session_id,
                 message=message,
-                md_uri=os.environ.get('SQLALCHEMY_DATABASE_URI'),
+                md_uri=self.md_uri,
                 username=username
             )
             
@@ -77,34 +209,7 @@ class AIAssistantAgent:
             logger.error(f"Error generating AI response: {e}")
             error_message = "I'm sorry, I encountered an error while processing your request. Please try again."
             yield error_message
-    
-    def sync_get_response(self, message, session_id=None, username=None):
-        """Synchronous wrapper for async response generation"""
-        try:
-            if not session_id or session_id not in self.sessions:
-                session_id = self.create_session()
-                
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            response_parts = []
-            
-            async def collect_response():
-                async for chunk in self.get_response_stream(message, session_id, username):
-                    response_parts.append(chunk)
-                return ''.join(response_parts)
-            
-            complete_response = loop.run_until_complete(collect_response())
-            return complete_response, session_id
-        except Exception as e:
-            logger.error(f"Error in sync response generation: {e}")
-            fallback_response = "I'm experiencing technical difficulties. Please try again later."
-            return fallback_response, session_id or self.create_session()
-        finally:
-            try:
-                loop.close()
-            except:
-                pass
+
 
 class AISupersetAssistantView(BaseView):
     
@@ -120,26 +225,65 @@ class AISupersetAssistantView(BaseView):
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.ai_agent = AIAssistantAgent()
-        self._setup_database()
+        # One long-lived event loop per process, shared by every request of this view.
+        # It is started (and the checkpoint tables set up) by the first request that needs it.
+        self._loop = None
+        self._loop_pid = None
+        self._loop_lock = threading.Lock()
+        self._checkpoint_setup = None
+        self._md_uri = os.environ.get('SQLALCHEMY_DATABASE_URI')
+        self.ai_agent = AIAssistantAgent(md_uri=self._md_uri)
+    
+    def _event_loop(self):
+        """Return the shared event loop, starting it on first use in this process
+        
+        Threads do not survive `fork`, so a loop started before gunicorn forks its
+        workers (e.g. with `preload_app`) is replaced by a fresh one in each worker.
+        """
+        if self._loop_pid != os.getpid():
+            with self._loop_lock:
+                if self._loop_pid != os.getpid():
+                    self._loop = asyncio.new_event_loop()
+                    threading.Thread(target=self._loop.run_forever, daemon=True).start()
+                    self._loop_pid = os.getpid()
+                    self._setup_database()
+        return self._loop
     
     def _setup_database(self):
-        """Setup database for AI agent checkpointing"""
+        """Setup database for AI agent checkpointing on the shared loop, without blocking"""
         try:
-            def setup_db():
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(Database.setup(md_uri=os.environ.get('SQLALCHEMY_DATABASE_URI')))
-                    logger.info("✅ AI Assistant database initialized successfully")
-                except Exception as e:
-                    logger.error(f"❌ Failed to setup AI Assistant database: {e}")
-            
-            thread = threading.Thread(target=setup_db, daemon=True)
-            thread.start()
+            future = asyncio.run_coroutine_threadsafe(
+                self._create_checkpoint_tables(self._md_uri), self._loop)
+            future.add_done_callback(self._on_database_setup)
+            self._checkpoint_setup = future
         except Exception as e:
             logger.error(f"Error starting database setup: {e}")
     
+    @staticmethod
+    async def _create_checkpoint_tables(md_uri):
+        """Run `Database.setup`, importing the checkpointer off the startup path"""
+        from superset_chat.app.databases.postgres import Database
+        await Database.setup(md_uri=md_uri)
+    
+    async def _checkpoint_tables_ready(self):
+        """Wait until the checkpoint table setup has finished, whatever its outcome
+        
+        The agent reads the checkpoint tables, so on a fresh database the first chat
+        in a worker must not race their creation.
+        """
+        if self._checkpoint_setup is not None:
+            # `asyncio.wait` does not cancel the setup if this request is cancelled.
+            await asyncio.wait({asyncio.wrap_future(self._checkpoint_setup)})
+    
+    @staticmethod
+    def _on_database_setup(future):
+        """Log the outcome of the database setup"""
+        error = future.exception()
+        if error:
+            logger.error(f"❌ Failed to setup AI Assistant database: {error}")
+        else:
+            logger.info("✅ AI Assistant database initialized successfully")
+    
     @expose('/assistant')
     @admin_only
     @failure_tolerant
@@ -147,308 +291,6 @@ class AISupersetAssistantView(BaseView):
         """Main AI Assistant interface with real chat functionality"""
         
         try:
-            # Interactive chat interface content
-            assistant_content = '''
-        <style>
-            .ai-assistant-container {
-                max-width: 1200px;
-                margin: 0 auto;
-                padding: 20px;
-                height: calc(100vh - 100px);
-                display: flex;
-                flex-direction: column;
-            }
-            .assistant-header {
-                background: linear-gradient(135deg, #4CAF50 0%, #45a049 100%);
-                color: white;
-                padding: 20px;
-                border-radius: 10px 10px 0 0;
-                text-align: center;
-            }
-            .assistant-title {
-                margin: 0;
-                font-size: 1.8rem;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                gap: 10px;
-            }
-            .chat-container {
-                flex: 1;
-                display: flex;
-                flex-direction: column;
-                background: white;
-                border: 1px solid #e0e0e0;
-                border-top: none;
-            }
-            .chat-messages {
-                flex: 1;
-                padding: 20px;
-                overflow-y: auto;
-                background: #f8f9fa;
-                max-height: 500px;
-            }
-            .message {
-                margin-bottom: 15px;
-                padding: 12px 16px;
-                border-radius: 12px;
-                max-width: 80%;
-                word-wrap: break-word;
-            }
-            .message.user {
-                background: #007bff;
-                color: white;
-                margin-left: auto;
-                text-align: right;
-            }
-            .message.assistant {
-                background: white;
-                color: #333;
-                border: 1px solid #e0e0e0;
-                margin-right: auto;
-            }
-            .message.assistant pre {
-                background: #f1f3f4;
-                padding: 10px;
-                border-radius: 5px;
-                overflow-x: auto;
-                margin: 10px 0;
-            }
-            .message.assistant code {
-                background: #f1f3f4;
-                padding: 2px 4px;
-                border-radius: 3px;
-                font-family: 'Courier New', monospace;
-            }
-            
-            /* Expandable Code Blocks Styles */
-            .code-block-container {
-                margin: 15px 0;
-                border: 1px solid #e0e0e0;
-                border-radius: 8px;
-                overflow: hidden;
-                background: #f8f9fa;
-            }
-            .code-block-header {
-                background: linear-gradient(135deg, #4CAF50 0%, #45a049 100%);
-                color: white;
-                padding: 12px 16px;
-                cursor: pointer;
-                user-select: none;
-                display: flex;
-                align-items: center;
-                justify-content: space-between;
-                transition: background 0.3s ease;
-                font-weight: 500;
-            }
-            .code-block-header:hover {
-                background: linear-gradient(135deg, #45a049 0%, #3d8b40 100%);
-            }
-            .code-block-header .toggle-icon {
-                font-size: 16px;
-                transition: transform 0.3s ease;
-            }
-            .code-block-header.expanded .toggle-icon {
-                transform: rotate(180deg);
-            }
-            .code-block-content {
-                max-height: 0;
-                overflow: hidden;
-                transition: max-height 0.3s ease;
-                background: white;
-            }
-            .code-block-content.expanded {
-                max-height: 500px;
-                overflow-y: auto;
-            }
-            .code-block-content pre {
-                margin: 0;
-                padding: 16px;
-                background: #f1f3f4;
-                border: none;
-                font-family: 'Courier New', Monaco, monospace;
-                font-size: 14px;
-                line-height: 1.5;
-                white-space: pre-wrap;
-                word-wrap: break-word;
-            }
-            .tool-output {
-                background: #fff3cd;
-                border-left: 4px solid #ffc107;
-                padding: 16px;
-                margin-top: 8px;
-            }
-            .tool-output pre {
-                background: #fffbf0 !important;
-                padding: 12px;
-                border-radius: 4px;
-                overflow-x: auto;
-            }
-            
-            .message-time {
-                font-size: 0.8rem;
-                opacity: 0.7;
-                margin-top: 5px;
-            }
-            .chat-input-container {
-                padding: 20px;
-                background: white;
-                border-top: 1px solid #e0e0e0;
-                border-radius: 0 0 10px 10px;
-            }
-            .chat-input-form {
-                display: flex;
-                gap: 10px;
-                align-items: center;
-            }
-            .chat-input {
-                flex: 1;
-                padding: 12px 15px;
-                border: 2px solid #e0e0e0;
-                border-radius: 25px;
-                font-size: 14px;
-                outline: none;
-                transition: border-color 0.3s;
-            }
-            .chat-input:focus {
-                border-color: #4CAF50;
-            }
-            .chat-send-btn {
-                background: #4CAF50;
-                color: white;
-                border: none;
-                padding: 12px 20px;
-                border-radius: 25px;
-                cursor: pointer;
-                font-weight: 500;
-                transition: background 0.3s;
-                min-width: 80px;
-            }
-            .chat-send-btn:hover:not(:disabled) {
-                background: #45a049;
-            }
-            .chat-send-btn:disabled {
-                background: #ccc;
-                cursor: not-allowed;
-            }
-            .typing-indicator {
-                display: none;
-                padding: 12px 16px;
-                color: #666;
-                font-style: italic;
-                background: white;
-                border: 1px solid #e0e0e0;
-                border-radius: 12px;
-                margin-bottom: 15px;
-                max-width: 200px;
-            }
-            .typing-indicator.show {
-                display: block;
-            }
-            .control-buttons {
-                display: flex;
-                gap: 10px;
-                margin-bottom: 15px;
-            }
-            .control-btn {
-                background: #17a2b8;
-                color: white;
-                border: none;
-                padding: 8px 15px;
-                border-radius: 20px;
-                cursor: pointer;
-                font-size: 0.9rem;
-                transition: background 0.3s;
-            }
-            .control-btn:hover {
-                background: #138496;
-            }
-            .status-bar {
-                padding: 10px 20px;
-                background: #f8f9fa;
-                border-top: 1px solid #e0e0e0;
-                font-size: 0.9rem;
-                color: #666;
-                display: flex;
-                justify-content: between;
-                align-items: center;
-            }
-            .session-info {
-                font-size: 0.8rem;
-                opacity: 0.8;
-            }
-            @media (max-width: 768px) {
-                .ai-assistant-container {
-                    padding: 10px;
-                    height: calc(100vh - 80px);
-                }
-                .message {
-                    max-width: 95%;
-                }
-                .chat-input-form {
-                    flex-direction: column;
-                    gap: 10px;
-                }
-                .chat-input {
-                    width: 100%;
-                }
-            }
-        </style>
-        
-        <div class="ai-assistant-container">
-            <div class="assistant-header">
-                <h1 class="assistant-title">
-                    <span>🤖</span>
-                    AI Superset Assistant
-                </h1>
-                <p style="margin: 5px 0 0 0; opacity: 0.9;">Your intelligent Apache Superset companion</p>
-            </div>
-            
-            <div class="chat-container">
-                <div class="chat-messages" id="chatMessages">
-                    <div class="message assistant">
-                        <div>
-                            Hello! I'm your AI Superset Assistant 🚀<br><br>
-                            What would you like to know about Apache Superset?
-                        </div>
-                        <div class="message-time">Just now</div>
-                    </div>
-                </div>
-                
-                <div class="typing-indicator" id="typingIndicator">
-                    AI is thinking...
-                </div>
-                
-                <div class="chat-input-container">
-                    <div class="control-buttons">
-                        <button class="control-btn" id="newChatBtn">New Chat</button>
-                        <button class="control-btn" id="clearChatBtn">Clear Chat</button>
-                    </div>
-                    
-                    <form class="chat-input-form" id="chatInputForm">
-                        <input 
-                            type="text" 
-                            class="chat-input" 
-                            id="messageInput"
-                            placeholder="Ask me anything about Apache Superset..."
-                            maxlength="500"
-                            required
-                        >
-                        <button type="submit" class="chat-send-btn" id="sendBtn">
-                            Send
-                        </button>
-                    </form>
-                </div>
-                
-                <div class="status-bar">
-                    <span>Status: <span id="connectionStatus">Connected</span></span>
-                    <span class="session-info">Session: <span id="sessionId">Loading...</span></span>
-                </div>
-            </div>
-        </div>
-        
-        '''
-        
             # Try to get the nonce from various possible locations
             nonce = None
             try:
@@ -466,7 +308,7 @@ class AISupersetAssistantView(BaseView):
             # Create response with nonce if available
             response = self.render_template(
                 'ai_assistant.html',
-                content=assistant_content,
+                asset_versions=ASSET_VERSIONS,
                 nonce=nonce,
                 title="AI Superset Assistant",
                 base_template="appbuilder/baselayout.html",
@@ -480,12 +322,20 @@ class AISupersetAssistantView(BaseView):
             logger.error(traceback.format_exc())
             return f"Error loading AI Assistant: {e}", 500
     
+    @expose('/assets/<path:filename>')
+    @admin_only
+    def static_asset(self, filename):
+        """Serve the assistant's CSS/JS; asset URLs carry a content hash, so they never go stale"""
+        response = send_from_directory(STATIC_FOLDER, filename)
+        response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
+    
     @expose('/api/new_session', methods=['POST'])
     @admin_only
     @failure_tolerant
     def new_session(self):
         """Create a new chat session"""
-        session_id = self.ai_agent.create_session()
+        session_id = self.ai_agent.create_session(g._username)
         return jsonify({
             'session_id': session_id,
             'status': 'created',
@@ -497,7 +347,7 @@ class AISupersetAssistantView(BaseView):
     @failure_tolerant
     def chat_api(self):
         """Handle chat messages with real AI"""
-        data = request.get_json()
+        data = _loads(request.get_data())
         message = data.get('message', '').strip()
         session_id = data.get('session_id')
         
@@ -505,13 +355,16 @@ class AISupersetAssistantView(BaseView):
             return jsonify({'error': 'Message is required'}), 400
         
         try:
-            username = getattr(current_user, 'username', 'anonymous') if current_user and current_user.is_authenticated else 'anonymous'
-            response, session_id = self.ai_agent.sync_get_response(message, session_id, username)
-            return jsonify({
+            username = g._username
+            session_id = self.ai_agent.ensure_session(session_id, username)
+            future = asyncio.run_coroutine_threadsafe(
+                self._collect(message, session_id, username), self._event_loop())
+            response = future.result()
+            return Response(_dumps({
                 'response': response,
                 'session_id': session_id,
-                'timestamp': datetime.now().isoformat()
-            })
+                'timestamp': time.time()
+            }), mimetype='application/json')
         except Exception as e:
             logger.error(f"Chat API error: {e}")
             return jsonify({'error': 'Failed to process message'}), 500
@@ -521,74 +374,144 @@ class AISupersetAssistantView(BaseView):
     @failure_tolerant  
     def chat_stream_api(self):
         """Handle streaming chat messages with real AI"""
-        data = request.get_json()
+        data = _loads(request.get_data())
         message = data.get('message', '').strip()
         session_id = data.get('session_id')
         
         if not message:
             return jsonify({'error': 'Message is required'}), 400
         
+        username = g._username
+        
         def generate_stream():
             """Generator function for streaming responses"""
             try:
-                if not session_id or session_id not in self.ai_agent.sessions:
-                    new_session_id = self.ai_agent.create_session()
-                else:
-                    new_session_id = session_id
-                        
-                username = getattr(current_user, 'username', 'anonymous') if current_user and current_user.is_authenticated else 'anonymous'
-                    
-                yield f"data: {json.dumps({'type': 'session', 'session_id': new_session_id})}\n\n"
+                new_session_id = self.ai_agent.ensure_session(session_id, username)
                     
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
+                yield _SESSION_PREFIX + new_session_id.encode() + _SESSION_SUFFIX
                     
-                async def stream_response():
-                    async for chunk in self.ai_agent.get_response_stream(message, new_session_id, username):
-                        if chunk and chunk.strip():
-                            yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
-                    
-                async_gen = stream_response()
+                q = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+                future = asyncio.run_coroutine_threadsafe(
+                    self._pump(message, new_session_id, username, q), self._event_loop())
+                completed = False
                 try:
                     while True:
                         try:
-                            chunk_data = loop.run_until_complete(async_gen.__anext__())
-                            yield chunk_data
-                        except StopAsyncIteration:
+                            item = q.get(timeout=1)
+                        except queue.Empty:
+                            # The pump stopped without an end marker, e.g. it abandoned the stream.
+                            # Once it is done nothing more is put, so only an empty queue is final.
+                            if future.done() and q.empty():
+                                break
+                            continue
+                        if item is _STREAM_END:
+                            completed = True
                             break
+                        if isinstance(item, Exception):
+                            raise item
+                        yield item
                 finally:
-                    loop.close()
+                    # Stop the producer if the client disconnected or the stream failed,
+                    # and drop the frames it will never read.
+                    future.cancel()
+                    while True:
+                        try:
+                            q.get_nowait()
+                        except queue.Empty:
+                            break
                     
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                # A response cut short must not look complete to the client.
+                yield _DONE_FRAME if completed else _ERROR_FRAME
                     
             except Exception as e:
                 logger.error(f"Streaming chat error: {e}")
-                error_msg = json.dumps({
-                    'type': 'error', 
-                    'content': 'I encountered an error. Please try again.'
-                })
-                yield f"data: {error_msg}\n\n"
+                yield _ERROR_FRAME
             
         return Response(
             generate_stream(),
-            mimetype='text/plain',
+            mimetype='text/event-stream',
             headers={
                 'Cache-Control': 'no-cache',
                 'Connection': 'keep-alive',
-                'Content-Type': 'text/plain; charset=utf-8'
+                # Stop nginx from buffering the stream and delaying the first token.
+                'X-Accel-Buffering': 'no'
             }
         )
     
+    async def _collect(self, message, session_id, username):
+        """Collect the complete AI response as a single string"""
+        await self._checkpoint_tables_ready()
+        response_parts = []
+        async for chunk in self.ai_agent.get_response_stream(message, session_id, username):
+            response_parts.append(chunk)
+        return ''.join(response_parts)
+    
+    async def _pump(self, message, session_id, username, q):
+        """Push SSE frames for the AI response into `q`, ending with `_STREAM_END` if it completes
+        
+        Chunks are streamed as plain text; once the response is complete it is sent
+        again, rendered as HTML, in a single `html` frame.
+        
+        If the client stops reading for `STREAM_PUT_TIMEOUT` seconds, the response is abandoned.
+        """
+        stream = self.ai_agent.get_response_stream(message, session_id, username)
+        next_chunk = None
+        try:
+            await self._checkpoint_tables_ready()
+            response_parts = []
+            pending, pending_size = [], 0
+            last_flush = time.monotonic()
+            while True:
+                if next_chunk is None:
+                    next_chunk = asyncio.ensure_future(stream.__anext__())
+                # Buffered text waits at most the rest of the flush interval, even if the
+                # agent pauses (e.g. for a tool call). `asyncio.wait` leaves the pending
+                # `__anext__` running on timeout, where `wait_for` would cancel the stream.
+                timeout = None
+                if pending:
+                    timeout = max(0, last_flush + STREAM_FLUSH_INTERVAL - time.monotonic())
+                done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+                if done:
+                    try:
+                        chunk = next_chunk.result()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        next_chunk = None
+                    # `get_response_stream` never yields empty chunks.
+                    response_parts.append(chunk)
+                    pending.append(chunk)
+                    pending_size += len(chunk)
+                now = time.monotonic()
+                if pending and (not done or pending_size >= STREAM_FLUSH_CHARS
+                                or now - last_flush >= STREAM_FLUSH_INTERVAL):
+                    await _enqueue(q, _chunk_frame(''.join(pending)))
+                    pending, pending_size = [], 0
+                    last_flush = now
+            if pending:
+                await _enqueue(q, _chunk_frame(''.join(pending)))
+            await _enqueue(q, _frame({'type': 'html', 'content': _md_to_html(''.join(response_parts))}))
+            await _enqueue(q, _STREAM_END)
+        except queue.Full:
+            logger.warning(f"Client stopped reading the stream of session {session_id}, abandoning it")
+        except Exception as e:
+            await _enqueue(q, e)
+        finally:
+            # Release the LLM stream and its connections right away.
+            if next_chunk is not None:
+                next_chunk.cancel()
+                await asyncio.wait({next_chunk})
+            await stream.aclose()
+    
     @expose('/api/clear_session', methods=['POST'])
     @admin_only
     @failure_tolerant
     def clear_session(self):
         """Clear a chat session"""
-        data = request.get_json()
+        data = _loads(request.get_data())
         session_id = data.get('session_id')
         
-        if session_id and session_id in self.ai_agent.sessions:
-            del self.ai_agent.sessions[session_id]
+        if session_id and self.ai_agent.clear_session(session_id):
             return jsonify({'message': 'Session cleared successfully'})
         
         return jsonify({'error': 'Session not found'}), 404
\ No newline at end of file
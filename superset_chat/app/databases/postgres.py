@@ -1,9 +1,13 @@
 import os
+import re
 
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 
 from ..utils.singleton import Singleton
 
+# SQLAlchemy's "postgresql+<driver>" scheme, which libpq does not understand.
+_SQLALCHEMY_SCHEME = re.compile(r'^postgresql\+\w+(?=://)')
+
 
 class Database(metaclass=Singleton):
     """Represents the main database.
@@ -24,7 +28,7 @@ class Database(metaclass=Singleton):
         self.uri = \
             f'postgres://{auth}@{self.host}:{self.port}/{self.database}'
         if md_uri:
-            md_uri = md_uri.replace('postgresql+psycopg2', 'postgres')
+            md_uri = _SQLALCHEMY_SCHEME.sub('postgres', md_uri)
             self.uri = md_uri
 
     def get_connection_string(self) -> str:
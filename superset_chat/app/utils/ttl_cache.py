@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from time import monotonic
+
+_MISSING = object()
+
+
+class TTLCache:
+    """A bounded mapping whose entries expire `ttl` seconds after insertion.
+
+    Once `maxsize` entries are stored, inserting a new key evicts the least recently used one.
+    Expired entries are dropped lazily when they are looked up or evicted.
+
+    The cache is not thread-safe; guard it with a lock when it is shared between threads.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key, default=None):
+        """Return the value for `key` if present and not expired, else `default`."""
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            return default
+        expires_at, value = item
+        if expires_at < monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def pop(self, key, default=None):
+        """Remove `key` and return its value if present and not expired, else `default`."""
+        item = self._data.pop(key, _MISSING)
+        if item is _MISSING or item[0] < monotonic():
+            return default
+        return item[1]
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._data:
+            self._data.move_to_end(key)
+        elif len(self._data) >= self.maxsize:
+            self._data.popitem(last=False)
+        self._data[key] = (monotonic() + self.ttl, value)
+
+    def __delitem__(self, key):
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)